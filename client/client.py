@@ -1,9 +1,16 @@
 import os
 import json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+import atexit
+import time
+import mmap
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import grpc
-from dataNode.protos import dataNode_pb2
-from dataNode.protos import dataNode_pb2_grpc
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 """
 Cliente para el sistema distribuido DFS.
@@ -21,43 +28,85 @@ HOST_MAP = {
 
 # Configuración global
 NAMENODE_URL = "http://localhost:8000"
+# URLs fijas del NameNode, construidas una sola vez
+URL_REGISTER = f"{NAMENODE_URL}/register"
+URL_LOGIN = f"{NAMENODE_URL}/login"
+URL_LS = f"{NAMENODE_URL}/ls"
+URL_MKDIR = f"{NAMENODE_URL}/mkdir"
+URL_PUT_METADATA = f"{NAMENODE_URL}/put_metadata"
+URL_RM = f"{NAMENODE_URL}/rm/"
+URL_RMDIR = f"{NAMENODE_URL}/rmdir/"
+URL_GET_METADATA = f"{NAMENODE_URL}/get_metadata/"
 # tamaño de bloque
-from block_config import BLOCK_SIZE_MB, BLOCK_SIZE
+from block_config import BLOCK_SIZE
+# Máximo de transferencias de bloques simultáneas
+MAX_TRANSFER_WORKERS = 16
+# Máximo de buffers por llamada a writev
+IOV_MAX = 1024
 #token JWT en memoria
 TOKEN = None
 
+# Decodificador JSON de respuestas: orjson si está instalado
+json_loads = orjson.loads if orjson else json.loads
+
+# Metadata precargada por el primer ls de la sesión:
+# (filename, token) -> (expira, block_location). Cada entrada se usa una sola
+# vez (el siguiente get la consume) y caduca a los METADATA_CACHE_TTL segundos
+METADATA_CACHE_TTL = 30
+METADATA_CACHE = {}
+METADATA_PREFETCHED = False
+
+# Sesión HTTP compartida: reutiliza conexiones (keep-alive) hacia el NameNode
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+
 # Funciones REST para interactuar con el NameNode
 def register_user(username, password):
-    r = requests.post(f"{NAMENODE_URL}/register", json={
+    r = SESSION.post(URL_REGISTER, json={
         "username": username,
         "password": password
     })
-    resp = r.json()
+    resp = json_loads(r.content)
     if r.status_code == 200 and 'msg' in resp:
         print(resp['msg'])
     else:
         print("Error al registrar usuario.")
 
 def login(username, password):
-    global TOKEN
-    r = requests.post(f"{NAMENODE_URL}/login", data={
+    global TOKEN, METADATA_PREFETCHED
+    r = SESSION.post(URL_LOGIN, data={
         "username": username,
         "password": password
     })
     if r.status_code == 200:
-        TOKEN = r.json()["access_token"]
+        TOKEN = json_loads(r.content)["access_token"]
+        SESSION.headers["Authorization"] = f"Bearer {TOKEN}"
+        METADATA_CACHE.clear()
+        METADATA_PREFETCHED = False
         print("Login exitoso")
     else:
         print("Error de login.")
 
 def list_files(path=None):
-    headers = {"Authorization": f"Bearer {TOKEN}"}
+    global METADATA_PREFETCHED
     params = {}
+    if not METADATA_PREFETCHED:
+        params["include_metadata"] = "true"
     if path:
         params["path"] = path
-    r = requests.get(f"{NAMENODE_URL}/ls", headers=headers, params=params)
-    resp = r.json()
+    r = SESSION.get(URL_LS, params=params)
+    resp = json_loads(r.content)
     if r.status_code == 200 and 'files' in resp:
+        if 'metadata' in resp:
+            METADATA_PREFETCHED = True
+            expires = time.monotonic() + METADATA_CACHE_TTL
+            METADATA_CACHE.update({(f, TOKEN): (expires, meta) for f, meta in resp['metadata'].items()})
         if resp['files']:
             print("Archivos:")
             for f in resp['files']:
@@ -68,18 +117,17 @@ def list_files(path=None):
         print("Error al listar archivos.")
 
 def remove_file(filename):
-    headers = {"Authorization": f"Bearer {TOKEN}"}
-    r = requests.delete(f"{NAMENODE_URL}/rm/{filename}", headers=headers)
-    resp = r.json()
+    METADATA_CACHE.pop((filename, TOKEN), None)
+    r = SESSION.delete(URL_RM + filename)
+    resp = json_loads(r.content)
     if r.status_code == 200 and 'msg' in resp:
         print(resp['msg'])
     else:
         print(f"No se pudo eliminar '{filename}'.")
 
 def make_dir(dirname):
-    headers = {"Authorization": f"Bearer {TOKEN}"}
-    r = requests.post(f"{NAMENODE_URL}/mkdir", json={"dirname": dirname}, headers=headers)
-    resp = r.json()
+    r = SESSION.post(URL_MKDIR, json={"dirname": dirname})
+    resp = json_loads(r.content)
     if 'results' in resp:
         errores = [r['datanode'] for r in resp['results'] if not r['status'] == 'Directory created']
         if not errores:
@@ -94,9 +142,9 @@ def make_dir(dirname):
         print(f"No se pudo crear el directorio '{dirname}'.")
 
 def remove_dir(dirname):
-    headers = {"Authorization": f"Bearer {TOKEN}"}
-    r = requests.delete(f"{NAMENODE_URL}/rmdir/{dirname}", headers=headers)
-    resp = r.json()
+    METADATA_CACHE.clear()
+    r = SESSION.delete(URL_RMDIR + dirname)
+    resp = json_loads(r.content)
     if 'details' in resp:
         errores = [d for d in resp['details'] if 'Error' in d or 'not found' in d]
         if not errores:
@@ -111,12 +159,16 @@ def remove_dir(dirname):
         print(f"No se pudo eliminar el directorio '{dirname}'.")
 
 def get_metadata(filename):
-    headers = {"Authorization": f"Bearer {TOKEN}"}
-    r = requests.get(f"{NAMENODE_URL}/get_metadata/{filename}", headers=headers)
-    if r.status_code == 404:
-        print(f"El archivo '{filename}' no existe.")
-        return None
-    resp = r.json()
+    # Usar (y consumir) la metadata precargada por ls si aún no caducó
+    cached = METADATA_CACHE.pop((filename, TOKEN), None)
+    if cached and cached[0] > time.monotonic():
+        resp = {"filename": filename, "block_location": cached[1]}
+    else:
+        r = SESSION.get(URL_GET_METADATA + filename)
+        if r.status_code == 404:
+            print(f"El archivo '{filename}' no existe.")
+            return None
+        resp = json_loads(r.content)
     if 'block_location' in resp and 'blocks' in resp['block_location']:
         print(f"Bloques de '{filename}':")
         for b in resp['block_location']['blocks']:
@@ -125,46 +177,106 @@ def get_metadata(filename):
         print(f"No hay metadata para '{filename}'.")
     return resp
 
-def put_metadata(filename, size_mb):
-    headers = {"Authorization": f"Bearer {TOKEN}"}
-    r = requests.post(f"{NAMENODE_URL}/put_metadata",
-                      json={"filename": filename, "size_mb": size_mb},
-                      headers=headers)
+def put_metadata(filename, size_mb, size_bytes=None):
+    METADATA_CACHE.pop((filename, TOKEN), None)
+    r = SESSION.post(URL_PUT_METADATA,
+                     json={"filename": filename, "size_mb": size_mb, "size_bytes": size_bytes})
     try:
-        return r.json()
+        return json_loads(r.content)
     except Exception:
         print("Respuesta no válida del servidor.")
         return {}
 
 # Funciones gRPC para interactuar con los DataNodes
+# Resoluciones "datanode:puerto" -> (host, puerto) ya calculadas
+_RESOLVED = {}
+
+def resolve_datanode(datanode):
+    resolved = _RESOLVED.get(datanode)
+    if resolved is None:
+        raw_host, raw_port = datanode.split(":")
+        mapped = HOST_MAP.get(raw_host, f"{raw_host}:{raw_port}")
+        resolved = _RESOLVED[datanode] = tuple(mapped.split(":"))
+    return resolved
+
+# Canales y stubs reutilizados por DataNode ("host:port")
+_CHANNELS = {}
+_STUBS = {}
+
+def _get_stub(host, port):
+    key = f"{host}:{port}"
+    stub = _STUBS.get(key)
+    if stub is None:
+        # gRPC se importa solo cuando hace falta (ls, login, etc. no lo usan)
+        import grpc
+        from dataNode.protos import dataNode_pb2_grpc
+        channel = grpc.insecure_channel(
+            key,
+            options=[
+                ("grpc.max_send_message_length", BLOCK_SIZE + 1024),
+                ("grpc.max_receive_message_length", BLOCK_SIZE + 1024),
+            ]
+        )
+        _CHANNELS[key] = channel
+        stub = _STUBS[key] = dataNode_pb2_grpc.DataNodeServiceStub(channel)
+    return stub
+
+def _close_channels():
+    for channel in _CHANNELS.values():
+        channel.close()
+    _CHANNELS.clear()
+    _STUBS.clear()
+
+atexit.register(_close_channels)
+
 def store_block(host, port, block_id, data):
-    with grpc.insecure_channel(f"{host}:{port}") as channel:
-        stub = dataNode_pb2_grpc.DataNodeServiceStub(channel)
-        request = dataNode_pb2.BlockRequest(block_id=block_id, data=data)
-        response = stub.StoreBlock(request)
-        return response.status
+    from dataNode.protos import dataNode_pb2
+    stub = _get_stub(host, port)
+    request = dataNode_pb2.BlockRequest(block_id=block_id, data=data)
+    response = stub.StoreBlock(request)
+    return response.status
 
 def get_block(host, port, block_id):
+    import grpc
+    from dataNode.protos import dataNode_pb2
     try:
-        with grpc.insecure_channel(
-            f"{host}:{port}",
-            options=[
-                ("grpc.max_send_message_length", 4 * 1024 * 1024 + 1024),
-                ("grpc.max_receive_message_length", 4 * 1024 * 1024 + 1024),
-            ]
-        ) as channel:
-            stub = dataNode_pb2_grpc.DataNodeServiceStub(channel)
-            request = dataNode_pb2.BlockRequest(block_id=block_id)
-            response = stub.GetBlock(request)
-            if response.status == "OK":
-                return response.data
-            else:
-                print(f"[ERROR] Bloque '{block_id}' perdido en nodo {host}:{port} ({response.status})")
-                return None
+        stub = _get_stub(host, port)
+        request = dataNode_pb2.BlockRequest(block_id=block_id)
+        response = stub.GetBlock(request)
+        if response.status == "OK":
+            return response.data
+        else:
+            print(f"[ERROR] Bloque '{block_id}' perdido en nodo {host}:{port} ({response.status})")
+            return None
     except grpc.RpcError as e:
         print(f"[ERROR] DataNode caído o inaccesible: {host}:{port} para el bloque {block_id}")
         return None
 
+def store_blocks(host, port, blocks):
+    # Envía varios bloques (block_id, data) en un único stream gRPC
+    from dataNode.protos import dataNode_pb2
+    stub = _get_stub(host, port)
+    requests_iter = (dataNode_pb2.BlockRequest(block_id=block_id, data=data) for block_id, data in blocks)
+    response = stub.StoreBlocks(requests_iter)
+    return response.status
+
+def get_blocks(host, port, block_ids):
+    # Descarga varios bloques en un único stream gRPC; devuelve {block_id: data}
+    import grpc
+    from dataNode.protos import dataNode_pb2
+    found = {}
+    try:
+        stub = _get_stub(host, port)
+        request = dataNode_pb2.BlockIdList(block_ids=block_ids)
+        for response in stub.GetBlocks(request):
+            if response.status == "OK":
+                found[response.block_id] = response.data
+            else:
+                print(f"[ERROR] Bloque '{response.block_id}' perdido en nodo {host}:{port} ({response.status})")
+    except grpc.RpcError as e:
+        print(f"[ERROR] DataNode caído o inaccesible: {host}:{port}")
+    return found
+
 # Comandos CLI: operaciones de usuario
 def put_file(filepath, dfs_path=None):
     if dfs_path is None:
@@ -176,20 +288,68 @@ def put_file(filepath, dfs_path=None):
             filename = dfs_path + '/' + os.path.basename(filepath)
         else:
             filename = dfs_path
-    size_mb = BLOCK_SIZE_MB * ((os.path.getsize(filepath) + BLOCK_SIZE - 1) // BLOCK_SIZE)
+    size_bytes = os.stat(filepath).st_size
+    size_mb = -(-size_bytes // (1024 * 1024))
 
-    resp = put_metadata(filename, size_mb)
+    resp = put_metadata(filename, size_mb, size_bytes)
     assignments = resp["metadata"]
 
-    # Dividir archivo en bloques
-    with open(filepath, "rb") as f:
-        for i, assignment in enumerate(assignments):
-            block_data = f.read(BLOCK_SIZE)
-            raw_host, raw_port = assignment["datanode"].split(":")
-            mapped = HOST_MAP.get(raw_host, f"{raw_host}:{raw_port}")
-            host, port = mapped.split(":")
-            status = store_block(host, port, assignment["id"], block_data)
-            print(f"Bloque {i} enviado a {host}:{port} → {status}")
+    if not assignments:
+        return
+
+    # Archivo de un solo bloque: se lee de una vez y se envía con StoreBlock
+    # desde este hilo, sin mmap, stream ni pool de hilos
+    if len(assignments) == 1:
+        host, port = resolve_datanode(assignments[0]["datanode"])
+        with open(filepath, "rb") as f:
+            data = f.read()
+        status = store_block(host, port, assignments[0]["id"], data)
+        print(f"Bloques [0] enviados a {host}:{port} → {status}")
+        return
+
+    # Agrupar los índices de bloque por DataNode: un stream por nodo
+    by_node = {}
+    for i, assignment in enumerate(assignments):
+        by_node.setdefault(assignment["datanode"], []).append(i)
+
+    # Dividir archivo en bloques: el archivo se mapea en memoria y cada stream
+    # toma sus slices a medida que gRPC los consume
+    with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        def send(datanode):
+            indexes = by_node[datanode]
+            host, port = resolve_datanode(datanode)
+            blocks = ((assignments[i]["id"], mm[i * BLOCK_SIZE:(i + 1) * BLOCK_SIZE]) for i in indexes)
+            status = store_blocks(host, port, blocks)
+            print(f"Bloques {indexes} enviados a {host}:{port} → {status}")
+
+        with ThreadPoolExecutor(max_workers=min(MAX_TRANSFER_WORKERS, len(by_node))) as ex:
+            list(ex.map(send, by_node))
+
+def write_blocks(output_path, blocks):
+    # Escribe todos los bloques con writev (pocas syscalls) o con una sola escritura
+    if not hasattr(os, "writev"):
+        with open(output_path, "wb") as f:
+            f.write(b"".join(blocks))
+        return
+    pending = [memoryview(b) for b in blocks]
+    fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # Reservar el tamaño final de una vez para que el archivo quede contiguo
+        total = sum(len(b) for b in pending)
+        if total and hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, total)
+        while pending:
+            written = os.writev(fd, pending[:IOV_MAX])
+            # Descartar lo ya escrito (writev puede escribir parcialmente)
+            while written and pending:
+                if written >= len(pending[0]):
+                    written -= len(pending[0])
+                    pending.pop(0)
+                else:
+                    pending[0] = pending[0][written:]
+                    written = 0
+    finally:
+        os.close(fd)
 
 def get_file(filename, output_path):
     # Preguntar al NameNode
@@ -199,20 +359,45 @@ def get_file(filename, output_path):
         return
     assignments = meta["block_location"]["blocks"]
 
-    # Descargar bloques y reconstruir archivo
-    with open(output_path, "wb") as f:
-        all_ok = True
-        for block in assignments:
-            raw_host, raw_port = block["datanode"].split(":")
-            mapped = HOST_MAP.get(raw_host, f"{raw_host}:{raw_port}")
-            host, port = mapped.split(":")
-            data = get_block(host, port, block["id"])
+    # Archivo de un solo bloque: un GetBlock directo desde este hilo
+    if len(assignments) == 1:
+        block_id = assignments[0]["id"]
+        host, port = resolve_datanode(assignments[0]["datanode"])
+        data = get_block(host, port, block_id)
+        if data:
+            print(f"[INFO] Bloque {block_id} recuperado de {host}:{port}")
+            write_blocks(output_path, [data])
+            print(f"[INFO] Archivo reconstruido en {output_path}")
+        else:
+            write_blocks(output_path, [])
+            print("[ERROR] No se pudieron recuperar todos los bloques.")
+        return
+
+    # Agrupar los bloques por DataNode: un stream por nodo
+    by_node = {}
+    for i, block in enumerate(assignments):
+        by_node.setdefault(block["datanode"], []).append(i)
+
+    def fetch(datanode):
+        indexes = by_node[datanode]
+        host, port = resolve_datanode(datanode)
+        found = get_blocks(host, port, [assignments[i]["id"] for i in indexes])
+        for i in indexes:
+            block_id = assignments[i]["id"]
+            data = found.get(block_id)
             if data:
-                f.write(data)
-                print(f"[INFO] Bloque {block['id']} recuperado de {host}:{port}")
+                buf[i] = data
+                print(f"[INFO] Bloque {block_id} recuperado de {host}:{port}")
             else:
-                print(f"[ERROR] Bloque {block['id']} perdido o nodo inaccesible: {host}:{port}")
-                all_ok = False
+                print(f"[ERROR] Bloque {block_id} perdido o nodo inaccesible: {host}:{port}")
+
+    # Descargar bloques en paralelo y reconstruir archivo en orden
+    buf = [None] * len(assignments)
+    if by_node:
+        with ThreadPoolExecutor(max_workers=min(MAX_TRANSFER_WORKERS, len(by_node))) as ex:
+            list(ex.map(fetch, by_node))
+    all_ok = all(buf)
+    write_blocks(output_path, [data for data in buf if data])
     if all_ok:
         print(f"[INFO] Archivo reconstruido en {output_path}")
     else:
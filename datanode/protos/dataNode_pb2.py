@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0e\x64\x61taNode.proto\x12\x08\x64\x61taNode\"\x1e\n\nDirRequest\x12\x10\n\x08\x64ir_name\x18\x01 \x01(\t\".\n\x0c\x42lockRequest\x12\x10\n\x08\x62lock_id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\"<\n\nBlockReply\x12\x10\n\x08\x62lock_id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\x12\x0e\n\x06status\x18\x03 \x01(\t2\xb4\x02\n\x0f\x44\x61taNodeService\x12:\n\nStoreBlock\x12\x16.dataNode.BlockRequest\x1a\x14.dataNode.BlockReply\x12\x38\n\x08GetBlock\x12\x16.dataNode.BlockRequest\x1a\x14.dataNode.BlockReply\x12;\n\x0b\x44\x65leteBlock\x12\x16.dataNode.BlockRequest\x1a\x14.dataNode.BlockReply\x12\x35\n\x07MakeDir\x12\x14.dataNode.DirRequest\x1a\x14.dataNode.BlockReply\x12\x37\n\tDeleteDir\x12\x14.dataNode.DirRequest\x1a\x14.dataNode.BlockReplyb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0e\x64\x61taNode.proto\x12\x08\x64\x61taNode\"\x1e\n\nDirRequest\x12\x10\n\x08\x64ir_name\x18\x01 \x01(\t\".\n\x0c\x42lockRequest\x12\x10\n\x08\x62lock_id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\" \n\x0b\x42lockIdList\x12\x11\n\tblock_ids\x18\x01 \x03(\t\"<\n\nBlockReply\x12\x10\n\x08\x62lock_id\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\x12\x0e\n\x06status\x18\x03 \x01(\t2\xaf\x03\n\x0f\x44\x61taNodeService\x12:\n\nStoreBlock\x12\x16.dataNode.BlockRequest\x1a\x14.dataNode.BlockReply\x12\x38\n\x08GetBlock\x12\x16.dataNode.BlockRequest\x1a\x14.dataNode.BlockReply\x12;\n\x0b\x44\x65leteBlock\x12\x16.dataNode.BlockRequest\x1a\x14.dataNode.BlockReply\x12\x35\n\x07MakeDir\x12\x14.dataNode.DirRequest\x1a\x14.dataNode.BlockReply\x12\x37\n\tDeleteDir\x12\x14.dataNode.DirRequest\x1a\x14.dataNode.BlockReply\x12=\n\x0bStoreBlocks\x12\x16.dataNode.BlockRequest\x1a\x14.dataNode.BlockReply(\x01\x12:\n\tGetBlocks\x12\x15.dataNode.BlockIdList\x1a\x14.dataNode.BlockReply0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -35,8 +35,10 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_DIRREQUEST']._serialized_end=58
   _globals['_BLOCKREQUEST']._serialized_start=60
   _globals['_BLOCKREQUEST']._serialized_end=106
-  _globals['_BLOCKREPLY']._serialized_start=108
-  _globals['_BLOCKREPLY']._serialized_end=168
-  _globals['_DATANODESERVICE']._serialized_start=171
-  _globals['_DATANODESERVICE']._serialized_end=479
+  _globals['_BLOCKIDLIST']._serialized_start=108
+  _globals['_BLOCKIDLIST']._serialized_end=140
+  _globals['_BLOCKREPLY']._serialized_start=142
+  _globals['_BLOCKREPLY']._serialized_end=202
+  _globals['_DATANODESERVICE']._serialized_start=205
+  _globals['_DATANODESERVICE']._serialized_end=636
 # @@protoc_insertion_point(module_scope)
@@ -59,6 +59,16 @@ class DataNodeServiceStub(object):
                 request_serializer=dataNode__pb2.DirRequest.SerializeToString,
                 response_deserializer=dataNode__pb2.BlockReply.FromString,
                 _registered_method=True)
+        self.StoreBlocks = channel.stream_unary(
+                '/dataNode.DataNodeService/StoreBlocks',
+                request_serializer=dataNode__pb2.BlockRequest.SerializeToString,
+                response_deserializer=dataNode__pb2.BlockReply.FromString,
+                _registered_method=True)
+        self.GetBlocks = channel.unary_stream(
+                '/dataNode.DataNodeService/GetBlocks',
+                request_serializer=dataNode__pb2.BlockIdList.SerializeToString,
+                response_deserializer=dataNode__pb2.BlockReply.FromString,
+                _registered_method=True)
 
 
 class DataNodeServiceServicer(object):
@@ -94,6 +104,18 @@ class DataNodeServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StoreBlocks(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetBlocks(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_DataNodeServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -122,6 +144,16 @@ def add_DataNodeServiceServicer_to_server(servicer, server):
                     request_deserializer=dataNode__pb2.DirRequest.FromString,
                     response_serializer=dataNode__pb2.BlockReply.SerializeToString,
             ),
+            'StoreBlocks': grpc.stream_unary_rpc_method_handler(
+                    servicer.StoreBlocks,
+                    request_deserializer=dataNode__pb2.BlockRequest.FromString,
+                    response_serializer=dataNode__pb2.BlockReply.SerializeToString,
+            ),
+            'GetBlocks': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetBlocks,
+                    request_deserializer=dataNode__pb2.BlockIdList.FromString,
+                    response_serializer=dataNode__pb2.BlockReply.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'dataNode.DataNodeService', rpc_method_handlers)
@@ -267,3 +299,57 @@ class DataNodeService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def StoreBlocks(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/dataNode.DataNodeService/StoreBlocks',
+            dataNode__pb2.BlockRequest.SerializeToString,
+            dataNode__pb2.BlockReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetBlocks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/dataNode.DataNodeService/GetBlocks',
+            dataNode__pb2.BlockIdList.SerializeToString,
+            dataNode__pb2.BlockReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
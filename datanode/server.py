@@ -1,9 +1,15 @@
 import grpc
-from concurrent import futures
+import asyncio
 import time
+import signal
 import os
 import requests
+from requests.adapters import HTTPAdapter
 import shutil
+import fcntl
+import mmap
+import queue
+import uuid
 from dataNode.protos import dataNode_pb2
 from dataNode.protos import dataNode_pb2_grpc
 
@@ -22,92 +28,265 @@ DATANODE_HOST = "0.0.0.0"
 NAMENODE_URL = os.getenv("NAMENODE_URL", "http://namenode:8000")
 # Intervalo de heartbeat en segundos
 HEARTBEAT_INTERVAL = 10
+# Máximo de operaciones de disco concurrentes
+IO_CONCURRENCY = 32
+# Sesión HTTP persistente para heartbeats: una sola conexión reutilizada
+HEARTBEAT_SESSION = requests.Session()
+HEARTBEAT_SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+HEARTBEAT_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
 # Carpeta local para bloques
 STORAGE_DIR = "dataNode/storage/blocks"
 os.makedirs(STORAGE_DIR, exist_ok=True)
+# Descriptor de la carpeta de bloques: las operaciones por bloque usan rutas
+# relativas a él (openat/unlinkat) en vez de resolver STORAGE_DIR cada vez
+STORAGE_DIR_FD = os.open(STORAGE_DIR, os.O_RDONLY | os.O_DIRECTORY)
+# Escritura de bloques con O_DIRECT (sin pasar por la page cache) y su alineación
+DIRECT_IO = os.getenv("DATANODE_DIRECT_IO", "1") == "1"
+DIRECT_IO_ALIGNMENT = int(os.getenv("DATANODE_DIRECT_IO_ALIGNMENT", "4096"))
+# Pool de buffers alineados reutilizables para O_DIRECT (se llena bajo demanda)
+DIRECT_BUFFER_SIZE = -(-BLOCK_SIZE // DIRECT_IO_ALIGNMENT) * DIRECT_IO_ALIGNMENT
+DIRECT_BUFFER_POOL = queue.Queue(maxsize=8)
+# Subcarpetas de bloques ya creadas (evita makedirs en cada StoreBlock)
+ENSURED_DIRS = set()
 
-# Servicio gRPC principal
-class DataNodeService(dataNode_pb2_grpc.DataNodeServiceServicer):
-    def DeleteDir(self, request, context):
-        dir_path = os.path.join(STORAGE_DIR, request.dir_name)
-        try:
-            if os.path.exists(dir_path) and os.path.isdir(dir_path):
-                shutil.rmtree(dir_path)
-                print(f"[INFO] Carpeta eliminada: {dir_path}")
-                return dataNode_pb2.BlockReply(
-                    block_id=request.dir_name,
-                    status="Directory deleted"
-                )
-            else:
-                print(f"[ERROR] Carpeta {dir_path} no existe para eliminar")
-                return dataNode_pb2.BlockReply(
-                    block_id=request.dir_name,
-                    status="Directory not found"
-                )
-        except Exception as e:
-            print(f"[ERROR] No se pudo eliminar carpeta: {dir_path} → {e}")
-            return dataNode_pb2.BlockReply(
-                block_id=request.dir_name,
-                status=f"Error: {e}"
+# Operaciones de disco (bloqueantes): se ejecutan en hilos desde el servicio asíncrono
+def delete_dir(request):
+    dir_path = os.path.join(STORAGE_DIR, request.dir_name)
+    try:
+        if os.path.exists(dir_path) and os.path.isdir(dir_path):
+            shutil.rmtree(dir_path)
+            ENSURED_DIRS.difference_update(
+                d for d in list(ENSURED_DIRS) if d == dir_path or d.startswith(dir_path + os.sep)
             )
-
-    def MakeDir(self, request, context):
-        dir_path = os.path.join(STORAGE_DIR, request.dir_name)
-        try:
-            os.makedirs(dir_path, exist_ok=True)
-            print(f"[INFO] Carpeta creada: {dir_path}")
+            print(f"[INFO] Carpeta eliminada: {dir_path}")
             return dataNode_pb2.BlockReply(
                 block_id=request.dir_name,
-                status="Directory created"
+                status="Directory deleted"
             )
-        except Exception as e:
-            print(f"[ERROR] No se pudo crear carpeta: {dir_path} → {e}")
+        else:
+            print(f"[ERROR] Carpeta {dir_path} no existe para eliminar")
             return dataNode_pb2.BlockReply(
                 block_id=request.dir_name,
-                status=f"Error: {e}"
+                status="Directory not found"
             )
+    except Exception as e:
+        print(f"[ERROR] No se pudo eliminar carpeta: {dir_path} → {e}")
+        return dataNode_pb2.BlockReply(
+            block_id=request.dir_name,
+            status=f"Error: {e}"
+        )
 
-    def StoreBlock(self, request, context):
-        block_path = os.path.join(STORAGE_DIR, request.block_id)
-        os.makedirs(os.path.dirname(block_path), exist_ok=True)
-        print(f"[DataNode] Guardando bloque: {request.block_id} en {block_path} (size: {len(request.data)} bytes)")
-        with open(block_path, "wb") as f:
-            f.write(request.data)
+def make_dir(request):
+    dir_path = os.path.join(STORAGE_DIR, request.dir_name)
+    try:
+        os.makedirs(dir_path, exist_ok=True)
+        print(f"[INFO] Carpeta creada: {dir_path}")
         return dataNode_pb2.BlockReply(
-            block_id=request.block_id,
-            status="Block stored successfully"
+            block_id=request.dir_name,
+            status="Directory created"
+        )
+    except Exception as e:
+        print(f"[ERROR] No se pudo crear carpeta: {dir_path} → {e}")
+        return dataNode_pb2.BlockReply(
+            block_id=request.dir_name,
+            status=f"Error: {e}"
         )
 
-    def GetBlock(self, request, context):
-        block_path = os.path.join(STORAGE_DIR, request.block_id)
-        if not os.path.exists(block_path):
-            return dataNode_pb2.BlockReply(
-                block_id=request.block_id,
-                status="Block not found"
-            )
-        with open(block_path, "rb") as f:
+def open_block_tmpfile(block_dir):
+    # Archivo temporal para escribir un bloque antes de publicarlo con su nombre.
+    # Con O_TMPFILE no tiene nombre hasta el link, así que un fallo no deja restos.
+    # Las rutas son relativas a STORAGE_DIR_FD
+    flags = os.O_WRONLY | getattr(os, "O_CLOEXEC", 0)
+    if hasattr(os, "O_TMPFILE"):
+        try:
+            return os.open(block_dir, flags | os.O_TMPFILE, 0o644, dir_fd=STORAGE_DIR_FD), None
+        except OSError:
+            pass  # sistema de archivos sin soporte para O_TMPFILE
+    tmp_name = os.path.join(block_dir, f".{uuid.uuid4().hex}.tmp")
+    return os.open(tmp_name, flags | os.O_CREAT | os.O_EXCL, 0o644, dir_fd=STORAGE_DIR_FD), tmp_name
+
+def publish_block(fd, tmp_name, block_id):
+    # Da nombre al bloque de forma atómica: nunca se ve un bloque a medio escribir
+    if tmp_name is None:
+        # linkat con AT_SYMLINK_FOLLOW sobre /proc/self/fd (os.link solo lo usa
+        # cuando recibe un dir_fd)
+        proc_path = f"/proc/self/fd/{fd}"
+        try:
+            os.link(proc_path, block_id, dst_dir_fd=STORAGE_DIR_FD, follow_symlinks=True)
+            return
+        except FileExistsError:
+            # El bloque ya existía: enlazar con nombre temporal y reemplazar
+            tmp_name = os.path.join(os.path.dirname(block_id), f".{uuid.uuid4().hex}.tmp")
+            os.link(proc_path, tmp_name, dst_dir_fd=STORAGE_DIR_FD, follow_symlinks=True)
+    os.replace(tmp_name, block_id, src_dir_fd=STORAGE_DIR_FD, dst_dir_fd=STORAGE_DIR_FD)
+
+def enable_direct_io(fd):
+    # Activa O_DIRECT sobre un descriptor ya abierto; False si el sistema de
+    # archivos no lo soporta (p. ej. tmpfs)
+    if not DIRECT_IO or not hasattr(os, "O_DIRECT"):
+        return False
+    try:
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_DIRECT)
+        return True
+    except OSError:
+        return False
+
+def acquire_direct_buffer(aligned_size):
+    # Reutiliza buffers alineados de tamaño de bloque para no pagar mmap/munmap
+    # y fallos de página por cada escritura
+    if aligned_size <= DIRECT_BUFFER_SIZE:
+        try:
+            return DIRECT_BUFFER_POOL.get_nowait()
+        except queue.Empty:
+            return mmap.mmap(-1, DIRECT_BUFFER_SIZE)
+    return mmap.mmap(-1, aligned_size)
+
+def release_direct_buffer(buf):
+    if len(buf) == DIRECT_BUFFER_SIZE:
+        try:
+            DIRECT_BUFFER_POOL.put_nowait(buf)
+            return
+        except queue.Full:
+            pass
+    buf.close()
+
+def write_direct(fd, data):
+    # O_DIRECT exige buffer, tamaño y offset alineados: se copia el bloque a un
+    # buffer anónimo (alineado a página), se escribe con relleno y se recorta
+    size = len(data)
+    aligned_size = -(-size // DIRECT_IO_ALIGNMENT) * DIRECT_IO_ALIGNMENT
+    if not aligned_size:
+        return
+    buf = acquire_direct_buffer(aligned_size)
+    try:
+        buf[:size] = data
+        buf[size:aligned_size] = bytes(aligned_size - size)
+        view = memoryview(buf)[:aligned_size]
+        try:
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            view.release()
+    finally:
+        release_direct_buffer(buf)
+    os.ftruncate(fd, size)
+
+def store_block(request):
+    block_path = os.path.join(STORAGE_DIR, request.block_id)
+    block_dir = os.path.dirname(block_path)
+    # Solo crear subcarpetas si el bloque está en una y no se creó antes
+    if "/" in request.block_id and block_dir not in ENSURED_DIRS:
+        os.makedirs(block_dir, exist_ok=True)
+        ENSURED_DIRS.add(block_dir)
+    print(f"[DataNode] Guardando bloque: {request.block_id} en {block_path} (size: {len(request.data)} bytes)")
+    try:
+        fd, tmp_name = open_block_tmpfile(os.path.dirname(request.block_id) or ".")
+    except FileNotFoundError:
+        # La carpeta estaba en ENSURED_DIRS pero ya no existe (borrada por fuera
+        # o por un DeleteDir concurrente): recrearla y reintentar una vez
+        ENSURED_DIRS.discard(block_dir)
+        os.makedirs(block_dir, exist_ok=True)
+        ENSURED_DIRS.add(block_dir)
+        fd, tmp_name = open_block_tmpfile(os.path.dirname(request.block_id) or ".")
+    try:
+        if enable_direct_io(fd):
+            write_direct(fd, request.data)
+        else:
+            # Escritura directa sobre el descriptor; luego se libera la page cache
+            # para no desalojar bloques que se están leyendo
+            view = memoryview(request.data)
+            while view:
+                view = view[os.write(fd, view):]
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        publish_block(fd, tmp_name, request.block_id)
+    except Exception:
+        if tmp_name is not None:
+            try:
+                os.remove(tmp_name, dir_fd=STORAGE_DIR_FD)
+            except FileNotFoundError:
+                pass
+        raise
+    finally:
+        os.close(fd)
+    return dataNode_pb2.BlockReply(
+        block_id=request.block_id,
+        status="Block stored successfully"
+    )
+
+def get_block(request):
+    # Lectura sin buffer de Python y con readahead secuencial del kernel
+    try:
+        fd = os.open(request.block_id, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0), dir_fd=STORAGE_DIR_FD)
+        with open(fd, "rb", buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
             data = f.read()
+    except FileNotFoundError:
         return dataNode_pb2.BlockReply(
             block_id=request.block_id,
-            data=data,
-            status="OK"
+            status="Block not found"
         )
+    return dataNode_pb2.BlockReply(
+        block_id=request.block_id,
+        data=data,
+        status="OK"
+    )
 
-    def DeleteBlock(self, request, context):
-        block_path = os.path.join(STORAGE_DIR, request.block_id)
-        if os.path.exists(block_path):
-            os.remove(block_path)
-            print(f"[INFO] Bloque {request.block_id} eliminado")
-            return dataNode_pb2.BlockReply(
-                block_id=request.block_id,
-                status="Block deleted"
-            )
-        else:
-            print(f"[ERROR] Bloque {request.block_id} no existe para eliminar")
-            return dataNode_pb2.BlockReply(
-                block_id=request.block_id,
-                status="Block not found"
-            )
+def delete_block(request):
+    try:
+        os.remove(request.block_id, dir_fd=STORAGE_DIR_FD)
+    except FileNotFoundError:
+        print(f"[ERROR] Bloque {request.block_id} no existe para eliminar")
+        return dataNode_pb2.BlockReply(
+            block_id=request.block_id,
+            status="Block not found"
+        )
+    print(f"[INFO] Bloque {request.block_id} eliminado")
+    return dataNode_pb2.BlockReply(
+        block_id=request.block_id,
+        status="Block deleted"
+    )
+
+# Servicio gRPC principal (grpc.aio)
+class DataNodeService(dataNode_pb2_grpc.DataNodeServiceServicer):
+    def __init__(self):
+        # Limita las operaciones de disco concurrentes
+        self._io_sem = asyncio.Semaphore(IO_CONCURRENCY)
+
+    async def _run_io(self, fn, request):
+        async with self._io_sem:
+            return await asyncio.to_thread(fn, request)
+
+    async def DeleteDir(self, request, context):
+        return await self._run_io(delete_dir, request)
+
+    async def MakeDir(self, request, context):
+        return await self._run_io(make_dir, request)
+
+    async def StoreBlock(self, request, context):
+        return await self._run_io(store_block, request)
+
+    async def GetBlock(self, request, context):
+        return await self._run_io(get_block, request)
+
+    async def StoreBlocks(self, request_iterator, context):
+        # Recibe varios bloques por un único stream
+        stored = 0
+        async for request in request_iterator:
+            await self._run_io(store_block, request)
+            stored += 1
+        return dataNode_pb2.BlockReply(
+            status=f"{stored} blocks stored successfully"
+        )
+
+    async def GetBlocks(self, request, context):
+        # Devuelve varios bloques por un único stream, en el orden pedido
+        for block_id in request.block_ids:
+            yield await self._run_io(get_block, dataNode_pb2.BlockRequest(block_id=block_id))
+
+    async def DeleteBlock(self, request, context):
+        return await self._run_io(delete_block, request)
 
 # Registro y heartbeat en NameNode
 def register_with_namenode(max_retries=10, delay=3):
@@ -126,13 +305,30 @@ def register_with_namenode(max_retries=10, delay=3):
 
     raise RuntimeError("No se pudo registrar con el NameNode después de varios intentos")
 
-def send_heartbeat(datanode_id):
-    requests.post(f"{NAMENODE_URL}/heartbeat/{datanode_id}")
+def send_heartbeat(heartbeat_url):
+    # Con timeout para que un NameNode colgado no bloquee el apagado del DataNode
+    HEARTBEAT_SESSION.post(heartbeat_url, timeout=HEARTBEAT_INTERVAL)
+
+async def heartbeat_loop(datanode_id, stop_event):
+    # Enviar heartbeats periódicamente: los ticks se programan sobre el reloj
+    # monotónico (sin deriva) y la espera se interrumpe al activar stop_event
+    loop = asyncio.get_running_loop()
+    heartbeat_url = f"{NAMENODE_URL}/heartbeat/{datanode_id}"
+    next_tick = loop.time()
+    while not stop_event.is_set():
+        try:
+            await asyncio.to_thread(send_heartbeat, heartbeat_url)
+        except Exception as e:
+            print(f"[WARN] Falló el heartbeat al NameNode: {e}")
+        next_tick += HEARTBEAT_INTERVAL
+        try:
+            await asyncio.wait_for(stop_event.wait(), max(0, next_tick - loop.time()))
+        except asyncio.TimeoutError:
+            pass
 
-def serve(port):
-    # gRPC server
-    server = grpc.server(
-        futures.ThreadPoolExecutor(max_workers=10),
+async def serve(port):
+    # gRPC server asíncrono: las RPC en curso no ocupan un hilo cada una
+    server = grpc.aio.server(
         options=[
             ("grpc.max_send_message_length", 64 * 1024 * 1024),
             ("grpc.max_receive_message_length", 64 * 1024 * 1024),
@@ -140,23 +336,29 @@ def serve(port):
     )
     dataNode_pb2_grpc.add_DataNodeServiceServicer_to_server(DataNodeService(), server)
     server.add_insecure_port(f"{DATANODE_HOST}:{port}")
-    server.start()
+    await server.start()
     print(f"DataNode listening on {DATANODE_HOST}:{port}")
 
     # Registro en el NameNode
     global DATANODE_PORT
     DATANODE_PORT = port
-    info = register_with_namenode()
+    info = await asyncio.to_thread(register_with_namenode)
     datanode_id = info.get("id")
 
-    # Enviar heartbeats periódicamente
-    while True:
-        send_heartbeat(datanode_id)
-        time.sleep(HEARTBEAT_INTERVAL)
+    # Heartbeats como tarea del event loop; se detiene con SIGTERM/SIGINT
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+    heartbeat_task = asyncio.create_task(heartbeat_loop(datanode_id, stop_event))
+    await stop_event.wait()
+    print("[INFO] Deteniendo DataNode")
+    await heartbeat_task
+    await server.stop(grace=5)
 
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         port = int(sys.argv[1])
     else:
         port = 50051
-    serve(port)
\ No newline at end of file
+    asyncio.run(serve(port))
\ No newline at end of file
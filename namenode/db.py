@@ -1,9 +1,48 @@
+import os
 import sqlite3
+import queue
+from contextlib import contextmanager
 
 # Base de datos temporal sqlite para almacenamiento de metadata
 
 DB_PATH = "nameNode.db"
 
+# Pool de conexiones reutilizadas entre peticiones (los endpoints síncronos
+# corren en el pool de hilos de FastAPI, de ahí check_same_thread=False).
+# Tamaño configurable con DB_POOL_SIZE
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "20"))
+_pool = queue.Queue(maxsize=POOL_SIZE)
+
+def _new_conn():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+def open_pool():
+    for _ in range(POOL_SIZE - _pool.qsize()):
+        _pool.put(_new_conn())
+
+def close_pool():
+    while True:
+        try:
+            _pool.get_nowait().close()
+        except queue.Empty:
+            break
+
+@contextmanager
+def get_conn():
+    conn = _pool.get()
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _pool.put(conn)
+
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
@@ -26,6 +65,14 @@ def init_db():
         FOREIGN KEY(username) REFERENCES users(username)
     )
     """)
+    # La metadata es JSON en texto: convertir filas que quedaron guardadas como BLOB
+    c.execute("""
+    UPDATE files
+    SET metadata = CAST(metadata AS TEXT), block_location = CAST(block_location AS TEXT)
+    WHERE typeof(metadata) = 'blob' OR typeof(block_location) = 'blob'
+    """)
+    # Índice para las búsquedas por usuario y nombre (ls, get_metadata, rm, rmdir)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_files_user_name ON files(username, filename)")
 
     # Tabla de DataNodes
     c.execute("""
@@ -33,11 +80,20 @@ def init_db():
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         host TEXT NOT NULL,
         port INTEGER NOT NULL,
-        last_heartbeat TIMESTAMP
+        last_heartbeat INTEGER
     )
     """)
+    # last_heartbeat se guarda en segundos unix; convertir los valores antiguos
+    # guardados como texto (hora local ISO)
+    c.execute("""
+    UPDATE datanodes
+    SET last_heartbeat = CAST(strftime('%s', last_heartbeat, 'utc') AS INTEGER)
+    WHERE typeof(last_heartbeat) = 'text'
+    """)
+    # Un registro por DataNode (host, port): quitar duplicados que dejaban los
+    # reinicios y crear el índice único que usa el UPSERT de register_datanode
+    c.execute("DELETE FROM datanodes WHERE id NOT IN (SELECT MAX(id) FROM datanodes GROUP BY host, port)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_datanodes_host_port ON datanodes(host, port)")
 
     conn.commit()
     conn.close()
-
-init_db()
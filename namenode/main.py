@@ -1,18 +1,37 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request, Body, Query
+from fastapi import FastAPI, HTTPException, Depends, status, Body, Query, BackgroundTasks
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from typing import List
-from jose import JWTError, jwt
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+import threading
+import hashlib
+import hmac
+from collections import OrderedDict
+import jwt
 import time
 from datetime import datetime
-import sqlite3
-from .db import DB_PATH
+from .db import init_db, open_pool, close_pool, get_conn
 from block_config import BLOCK_SIZE_MB, BLOCK_SIZE
-import json
+import orjson
 import grpc
 from dataNode.protos import dataNode_pb2, dataNode_pb2_grpc
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crear las tablas una vez al arrancar el servidor (no al importar db.py),
+    # en un hilo para no bloquear el event loop con la E/S de sqlite
+    await asyncio.to_thread(init_db)
+    await asyncio.to_thread(open_pool)
+    yield
+    await close_channels()
+    close_pool()
+
+# Respuestas serializadas con orjson en lugar del json de la librería estándar
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 """
@@ -21,19 +40,35 @@ Expone una API REST para autenticación, gestión de archivos, directorios y met
 Coordina la asignación de bloques y DataNodes, y gestiona el registro y heartbeat de DataNodes.
 """
 
+# Logs del NameNode con el nivel de LOG_LEVEL (WARNING por defecto); los mensajes
+# se formatean solo si el nivel está habilitado
+logging.basicConfig(format="[%(levelname)s] %(message)s")
+logger = logging.getLogger("namenode")
+logger.setLevel(os.environ.get("LOG_LEVEL", "WARNING").upper())
+
 # Clave secreta y configuración JWT
 SECRET_KEY = "supersecretkey"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Segundos sin heartbeat tras los cuales un DataNode se considera inactivo
+HEARTBEAT_TIMEOUT = 30
+# Caché LRU de tokens ya verificados (token -> (username, válido hasta))
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 10
 
 # Modelos de datos
 class UserRegister(BaseModel):
     username: str
     password: str
 
+class DataNodeRegister(BaseModel):
+    host: str
+    port: int
+
 class FileMetadata(BaseModel):
     filename: str
     size_mb: int
+    size_bytes: Optional[int] = None
 
 # Autenticación y utilidades JWT
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
@@ -44,32 +79,147 @@ def create_access_token(data: dict, expires_delta: int = ACCESS_TOKEN_EXPIRE_MIN
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+# Argumentos de jwt.decode armados una sola vez: solo se verifican firma, exp y
+# sub, los únicos claims que emite create_access_token
+JWT_DECODE_KWARGS = {
+    "algorithms": [ALGORITHM],
+    "options": {
+        "require": ["exp", "sub"],
+        "verify_nbf": False,
+        "verify_iat": False,
+        "verify_aud": False,
+        "verify_iss": False,
+        "verify_jti": False,
+    },
+}
+
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
 def verify_token(token: str):
+    # Un token verificado hace poco se acepta sin volver a decodificarlo; nunca
+    # se guarda más allá de su exp ni se cachean tokens inválidos
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+        if cached and cached[1] > now:
+            _token_cache.move_to_end(token)
+            return cached[0]
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, **JWT_DECODE_KWARGS)
         username = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        return username
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    valid_until = min(payload["exp"], now + TOKEN_CACHE_TTL)
+    with _token_cache_lock:
+        _token_cache[token] = (username, valid_until)
+        _token_cache.move_to_end(token)
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return username
+
+# Filas de la tabla datanodes, cacheadas DATANODES_CACHE_TTL segundos para que
+# /datanodes, put_metadata, mkdir y rmdir no repitan el mismo escaneo completo
+DATANODES_CACHE_TTL = 1.0
+_datanodes_cache = (0.0, None)
+
+def load_datanodes(cur):
+    global _datanodes_cache
+    loaded_at, rows = _datanodes_cache
+    if rows is None or time.monotonic() - loaded_at >= DATANODES_CACHE_TTL:
+        cur.execute("SELECT id, host, port, last_heartbeat FROM datanodes")
+        rows = cur.fetchall()
+        _datanodes_cache = (time.monotonic(), rows)
+    return rows
+
+def invalidate_datanodes_cache():
+    global _datanodes_cache
+    _datanodes_cache = (0.0, None)
+
+# Consulta de DataNodes activos (heartbeat reciente), compartida por los endpoints
+def get_active_datanodes(cur):
+    now = int(time.time())
+    return [
+        {"id": row[0], "host": row[1], "port": row[2]}
+        for row in load_datanodes(cur)
+        if row[3] and now - row[3] < HEARTBEAT_TIMEOUT
+    ]
+
+# Canales gRPC persistentes por DataNode (host:port): se reutilizan entre
+# peticiones en lugar de abrir una conexión nueva en cada llamada
+_channels = {}
+_stubs = {}
+
+def get_stub(target):
+    stub = _stubs.get(target)
+    if stub is None:
+        channel = _channels[target] = grpc.aio.insecure_channel(target)
+        stub = _stubs[target] = dataNode_pb2_grpc.DataNodeServiceStub(channel)
+    return stub
+
+async def close_channels():
+    for channel in _channels.values():
+        await channel.close()
+    _channels.clear()
+    _stubs.clear()
+
+# Llamadas gRPC a DataNodes lanzadas en paralelo: la latencia total es la del
+# DataNode más lento y no la suma de todas
+async def call_datanodes(nodes, method, request):
+    async def call(node):
+        target = f"{node['host']}:{node['port']}"
+        try:
+            response = await getattr(get_stub(target), method)(request)
+            return {"datanode": target, "status": response.status}
+        except Exception as e:
+            return {"datanode": target, "status": f"Error: {e}"}
+    return await asyncio.gather(*(call(node) for node in nodes))
+
+async def delete_blocks(datanode, block_ids):
+    # Todos los DeleteBlock de un DataNode concurrentes sobre su canal
+    stub = get_stub(datanode)
+    responses = await asyncio.gather(
+        *(stub.DeleteBlock(dataNode_pb2.BlockRequest(block_id=block_id)) for block_id in block_ids),
+        return_exceptions=True,
+    )
+    for block_id, response in zip(block_ids, responses):
+        if isinstance(response, Exception):
+            logger.error("Error eliminando bloque %s en %s: %s", block_id, datanode, response)
+        else:
+            logger.info("Bloque %s eliminado en DataNode %s: %s", block_id, datanode, response.status)
+
+# Contraseñas guardadas como "scrypt$<salt>$<hash>" (hex); las filas antiguas en
+# texto plano se aceptan y se reemplazan por el hash en el siguiente login
+SCRYPT_PARAMS = {"n": 2 ** 14, "r": 8, "p": 1}
+
+def hash_password(password: str) -> str:
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, **SCRYPT_PARAMS)
+    return f"scrypt${salt.hex()}${digest.hex()}"
+
+def check_password(stored: str, password: str) -> bool:
+    if not stored.startswith("scrypt$"):
+        return hmac.compare_digest(stored.encode(), password.encode())
+    _, salt, digest = stored.split("$")
+    candidate = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), **SCRYPT_PARAMS)
+    return hmac.compare_digest(candidate, bytes.fromhex(digest))
 
 # Endpoints API REST
 @app.post("/register")
 def register(user: UserRegister):
-    print(f"[INFO] Registro de usuario: {user.username}")
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT username FROM users WHERE username=?", (user.username,))
-    if c.fetchone():
-        conn.close()
-        print(f"[ERROR] Usuario ya existe: {user.username}")
-        raise HTTPException(status_code=400, detail="User already exists")
-    c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (user.username, user.password))
-    conn.commit()
-    conn.close()
-    print(f"[INFO] Usuario registrado: {user.username}")
+    logger.info("Registro de usuario: %s", user.username)
+
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT username FROM users WHERE username=?", (user.username,))
+        if c.fetchone():
+            logger.error("Usuario ya existe: %s", user.username)
+            raise HTTPException(status_code=400, detail="User already exists")
+        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (user.username, hash_password(user.password)))
+        conn.commit()
+    logger.info("Usuario registrado: %s", user.username)
     return {"msg": "User registered"}
 
 
@@ -77,148 +227,174 @@ def register(user: UserRegister):
 def login(form_data: OAuth2PasswordRequestForm = Depends()):
     username = form_data.username
     password = form_data.password
-    print(f"[INFO] Login intento: {username}")
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT password FROM users WHERE username=?", (username,))
-    row = c.fetchone()
-    conn.close()
-    if not row or row[0] != password:
-        print(f"[ERROR] Login fallido para usuario: {username}")
-        raise HTTPException(status_code=400, detail="Incorrect username or password")
+    logger.info("Login intento: %s", username)
+
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT password FROM users WHERE username=?", (username,))
+        row = c.fetchone()
+        if not row or not check_password(row[0], password):
+            logger.error("Login fallido para usuario: %s", username)
+            raise HTTPException(status_code=400, detail="Incorrect username or password")
+        if not row[0].startswith("scrypt$"):
+            c.execute("UPDATE users SET password=? WHERE username=?", (hash_password(password), username))
+            conn.commit()
     token = create_access_token({"sub": username})
-    print(f"[INFO] Login exitoso: {username}")
+    logger.info("Login exitoso: %s", username)
     return {"access_token": token, "token_type": "bearer"}
 
 
 @app.get("/ls")
-def list_files(token: str = Depends(oauth2_scheme), path: str = Query(None)):
+def list_files(token: str = Depends(oauth2_scheme), path: str = Query(None),
+               include_metadata: bool = Query(False)):
     username = verify_token(token)
-    print(f"[INFO] Listando archivos para usuario: {username} en path: {path}")
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    if path is None or path == "":
-        # Listar raíz: solo los elementos de primer nivel
-        c.execute("SELECT filename FROM files WHERE username=?", (username,))
-        all_files = [row[0] for row in c.fetchall()]
-        files = []
-        for f in all_files:
-            rel = f.rstrip("/")
-            if "/" not in rel:
-                files.append(f)
-            elif f.endswith("/") and rel.count("/") == 1:
+    logger.info("Listando archivos para usuario: %s en path: %s", username, path)
+
+    # Con include_metadata se devuelve también la metadata de los archivos listados
+    # para que el cliente evite un /get_metadata posterior
+    metadata = {}
+    # El filtrado por nivel se hace en SQL, así solo llegan las entradas que se
+    # listan; la columna metadata solo se lee si se pidió
+    meta_column = "metadata" if include_metadata else "NULL"
+    with get_conn() as conn:
+        c = conn.cursor()
+        if path is None or path == "":
+            # Listar raíz: archivos y directorios sin '/' intermedia, y
+            # directorios de segundo nivel ('a/b/')
+            c.execute(f"""
+                SELECT filename, {meta_column} FROM files
+                WHERE username=? AND (
+                    filename NOT GLOB '*/[^/]*'
+                    OR (filename GLOB '*/'
+                        AND length(rtrim(filename, '/')) - length(replace(rtrim(filename, '/'), '/', '')) = 1)
+                )
+            """, (username,))
+            files = []
+            for f, meta in c:
                 files.append(f)
-        conn.close()
-        print(f"[INFO] Archivos encontrados: {files}")
-        return {"files": files}
-    else:
-        # Listar contenido de un subdirectorio
-        prefix = path.rstrip("/") + "/"
-        c.execute("SELECT filename FROM files WHERE username=? AND filename LIKE ?", (username, prefix + "%"))
-        all_files = [row[0] for row in c.fetchall()]
-        files = []
-        for f in all_files:
-            rel = f[len(prefix):].rstrip("/")
-            if rel and "/" not in rel:
+                if include_metadata and not f.endswith("/"):
+                    metadata.setdefault(f, orjson.Fragment(meta))
+            logger.info("Archivos encontrados: %s", files)
+        else:
+            # Listar contenido de un subdirectorio: filename en [prefix, prefix
+            # con la '/' final cambiada por '0') y sin '/' intermedia tras él
+            prefix = path.rstrip("/") + "/"
+            c.execute(f"""
+                SELECT filename, rtrim(substr(filename, :start), '/'), {meta_column} FROM files
+                WHERE username=:username AND filename >= :low AND filename < :high
+                    AND substr(filename, :start) NOT GLOB '*/[^/]*'
+                    AND rtrim(substr(filename, :start), '/') != ''
+            """, {"username": username, "low": prefix, "high": prefix[:-1] + "0", "start": len(prefix) + 1})
+            files = []
+            for f, rel, meta in c:
                 files.append(rel)
-        conn.close()
-        print(f"[INFO] Archivos encontrados en {path}: {files}")
-        return {"files": files}
+                if include_metadata and not f.endswith("/"):
+                    metadata.setdefault(f, orjson.Fragment(meta))
+            logger.info("Archivos encontrados en %s: %s", path, files)
+    # Se devuelve la respuesta ya construida para saltar el jsonable_encoder de
+    # FastAPI; la metadata guardada en la base (ya es JSON) se inserta tal cual
+    if include_metadata:
+        return ORJSONResponse({"files": files, "metadata": metadata})
+    return ORJSONResponse({"files": files})
 
 
 @app.post("/register_datanode")
-async def register_datanode(request: Request):
-    data = await request.json()
-    host, port = data["host"], data["port"]
-    print(f"[INFO] Registro de DataNode: {host}:{port}")
-
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO datanodes (host, port, last_heartbeat)
-        VALUES (?, ?, ?)
-    """, (host, port, datetime.now()))
-    datanode_id = cur.lastrowid
-    conn.commit()
-    conn.close()
+def register_datanode(node: DataNodeRegister):
+    # Endpoint síncrono: FastAPI lo ejecuta en su pool de hilos, así la
+    # escritura en sqlite no bloquea el event loop
+    host, port = node.host, node.port
+    logger.info("Registro de DataNode: %s:%s", host, port)
+
+    with get_conn() as conn:
+        cur = conn.cursor()
+        # Un DataNode que se reinicia conserva su fila e id en lugar de duplicarse
+        cur.execute("""
+            INSERT INTO datanodes (host, port, last_heartbeat)
+            VALUES (?, ?, ?)
+            ON CONFLICT(host, port) DO UPDATE SET last_heartbeat = excluded.last_heartbeat
+            RETURNING id
+        """, (host, port, int(time.time())))
+        datanode_id = cur.fetchone()[0]
+        conn.commit()
+    invalidate_datanodes_cache()
 
     return {"id": datanode_id, "msg": f"DataNode {host}:{port} registrado"}
 
 
+# Último heartbeat escrito por DataNode (time.monotonic()); los heartbeats que
+# llegan a menos de HEARTBEAT_MIN_WRITE_INTERVAL del anterior no se escriben
+HEARTBEAT_MIN_WRITE_INTERVAL = 1.0
+_last_heartbeat_write = {}
+
+def apply_heartbeat(datanode_id: int, timestamp: int):
+    with get_conn() as conn:
+        conn.execute("""
+            UPDATE datanodes
+            SET last_heartbeat = ?
+            WHERE id = ?
+        """, (timestamp, datanode_id))
+        conn.commit()
+
 @app.post("/heartbeat/{datanode_id}")
-def heartbeat(datanode_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE datanodes
-        SET last_heartbeat = ?
-        WHERE id = ?
-    """, (datetime.now(), datanode_id))
-    conn.commit()
-    conn.close()
+async def heartbeat(datanode_id: int, background_tasks: BackgroundTasks):
+    # Se responde de inmediato; el UPDATE corre como tarea en segundo plano
+    now = time.monotonic()
+    if now - _last_heartbeat_write.get(datanode_id, float("-inf")) >= HEARTBEAT_MIN_WRITE_INTERVAL:
+        _last_heartbeat_write[datanode_id] = now
+        background_tasks.add_task(apply_heartbeat, datanode_id, int(time.time()))
     return {"msg": f"DataNode {datanode_id} vivo"}
 
 
 @app.get("/datanodes")
 def list_datanodes():
-    print("[INFO] Listando DataNodes registrados")
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id, host, port, last_heartbeat FROM datanodes")
-    nodes = [{"id": row[0], "host": row[1], "port": row[2], "last_heartbeat": row[3]} for row in cur.fetchall()]
-    conn.close()
-    return {"datanodes": nodes}
+    logger.info("Listando DataNodes registrados")
+    with get_conn() as conn:
+        rows = load_datanodes(conn.cursor())
+    nodes = [
+        {"id": row[0], "host": row[1], "port": row[2],
+         "last_heartbeat": str(datetime.fromtimestamp(row[3])) if row[3] else None}
+        for row in rows
+    ]
+    return ORJSONResponse({"datanodes": nodes})
 
 
 @app.post("/put_metadata")
 def put_metadata(meta: FileMetadata, token: str = Depends(oauth2_scheme)):
     username = verify_token(token)
-    print(f"[INFO] Subiendo metadata para archivo: {meta.filename}, tamaño: {meta.size_mb}MB, usuario: {username}")
+    logger.info("Subiendo metadata para archivo: %s, tamaño: %sMB, usuario: %s", meta.filename, meta.size_mb, username)
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    with get_conn() as conn:
+        cur = conn.cursor()
 
-    # Consultar datanodes activos (heartbeat)
-    cur.execute("""
-        SELECT id, host, port, last_heartbeat
-        FROM datanodes
-    """)
-    all_nodes = cur.fetchall()
+        # Consultar datanodes activos (heartbeat)
+        active_nodes = get_active_datanodes(cur)
 
-    now = datetime.now()
-    active_nodes = [
-        {"id": row[0], "host": row[1], "port": row[2]}
-        for row in all_nodes
-        if row[3] and (now - datetime.fromisoformat(row[3])).total_seconds() < 30
-    ]
+        if not active_nodes:
+            raise HTTPException(status_code=500, detail="No active DataNodes available")
 
-    if not active_nodes:
-        conn.close()
-        raise HTTPException(status_code=500, detail="No active DataNodes available")
+        # Calcular número de bloques (tamaño exacto si el cliente lo envía)
+        if meta.size_bytes is not None:
+            file_size = meta.size_bytes
+        else:
+            file_size = meta.size_mb * 1024 * 1024
+        num_blocks = -(-file_size // BLOCK_SIZE)
 
-    # Calcular número de bloques
-    file_size = meta.size_mb
-    num_blocks = (file_size * 1024 * 1024 + BLOCK_SIZE - 1) // BLOCK_SIZE
+        # Asignar bloques a DataNodes (round-robin); cada "host:port" se arma una sola vez
+        node_addrs = [f"{node['host']}:{node['port']}" for node in active_nodes]
+        num_nodes = len(node_addrs)
+        assignments = [
+            {"id": f"{meta.filename}_block{i}", "datanode": node_addrs[i % num_nodes]}
+            for i in range(num_blocks)
+        ]
 
-    # Asignar bloques a DataNodes (round-robin)
-    assignments = []
-    for i in range(num_blocks):
-        node = active_nodes[i % len(active_nodes)]
-        assignments.append({
-            "id": f"{meta.filename}_block{i}",
-            "datanode": f"{node['host']}:{node['port']}"
-        })
+        # Se guarda como texto para que la columna TEXT tenga siempre JSON en texto
+        metadata_json = orjson.dumps({"blocks": assignments}).decode()
 
-    metadata_json = json.dumps({"blocks": assignments})
-
-    cur.execute("""
-        INSERT INTO files (username, filename, metadata, block_location)
-        VALUES (?, ?, ?, ?)
-    """, (username, meta.filename, metadata_json, metadata_json))
-    conn.commit()
-    conn.close()
+        cur.execute("""
+            INSERT INTO files (username, filename, metadata, block_location)
+            VALUES (?, ?, ?, ?)
+        """, (username, meta.filename, metadata_json, metadata_json))
+        conn.commit()
 
     return {"msg": "Metadata uploaded", "metadata": assignments}
 
@@ -226,117 +402,98 @@ def put_metadata(meta: FileMetadata, token: str = Depends(oauth2_scheme)):
 @app.get("/get_metadata/{filename:path}")
 def get_metadata(filename: str, token: str = Depends(oauth2_scheme)):
     username = verify_token(token)
-    print(f"[INFO] Obteniendo metadata para archivo: {filename} para usuario: {username}")
-
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    logger.info("Obteniendo metadata para archivo: %s para usuario: %s", filename, username)
 
-    c.execute("SELECT metadata FROM files WHERE username=? AND filename=?", (username, filename))
-    row = c.fetchone()
+    with get_conn() as conn:
+        c = conn.cursor()
+        c.execute("SELECT metadata FROM files WHERE username=? AND filename=?", (username, filename))
+        row = c.fetchone()
 
-    conn.close()
     if not row:
         raise HTTPException(status_code=404, detail="File not found")
-    return {"filename": filename, "block_location": json.loads(row[0])}
+    # La metadata guardada ya es JSON: se devuelve tal cual, sin decodificarla
+    return ORJSONResponse({"filename": filename, "block_location": orjson.Fragment(row[0])})
 
 
 @app.delete("/rm/{filename:path}")
-def remove_file(filename: str, token: str = Depends(oauth2_scheme)):
+async def remove_file(filename: str, token: str = Depends(oauth2_scheme)):
+    # Endpoint asíncrono para lanzar los DeleteBlock en paralelo; el acceso a
+    # sqlite se hace en un hilo para no bloquear el event loop
     username = verify_token(token)
-    print(f"[INFO] Eliminando archivo: {filename} para usuario: {username}")
-
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    logger.info("Eliminando archivo: %s para usuario: %s", filename, username)
 
     # Obtener metadata para saber los bloques y datanodes
-    cur.execute("SELECT metadata FROM files WHERE username=? AND filename=?", (username, filename))
-    row = cur.fetchone()
+    def fetch_metadata():
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT metadata FROM files WHERE username=? AND filename=?", (username, filename))
+            return cur.fetchone()
+
+    row = await asyncio.to_thread(fetch_metadata)
     if not row:
-        print(f"[ERROR] Archivo '{filename}' no existe para usuario: {username}")
-        conn.close()
+        logger.error("Archivo '%s' no existe para usuario: %s", filename, username)
         raise HTTPException(status_code=404, detail=f"File '{filename}' not found")
-    metadata = json.loads(row[0])
+    metadata = orjson.loads(row[0])
     blocks = metadata.get("blocks", [])
+    by_node = {}
     for block in blocks:
-        datanode = block["datanode"]
-        block_id = block["id"]
-        host, port = datanode.split(":")
-        try:
-            with grpc.insecure_channel(f"{host}:{port}") as channel:
-                stub = dataNode_pb2_grpc.DataNodeServiceStub(channel)
-                request = dataNode_pb2.BlockRequest(block_id=block_id)
-                response = stub.DeleteBlock(request)
-                print(f"[INFO] Bloque {block_id} eliminado en DataNode {datanode}: {response.status}")
-        except Exception as e:
-            print(f"[ERROR] Error eliminando bloque {block_id} en {datanode}: {e}")
+        by_node.setdefault(block["datanode"], []).append(block["id"])
+    await asyncio.gather(*(delete_blocks(datanode, block_ids) for datanode, block_ids in by_node.items()))
+
+    def delete_file():
+        with get_conn() as conn:
+            conn.execute("DELETE FROM files WHERE username=? AND filename=?", (username, filename))
+            conn.commit()
 
-    cur.execute("DELETE FROM files WHERE username=? AND filename=?", (username, filename))
-    conn.commit()
-    conn.close()
-    print(f"[INFO] Archivo '{filename}' y sus bloques eliminados")
+    await asyncio.to_thread(delete_file)
+    logger.info("Archivo '%s' y sus bloques eliminados", filename)
     return {"msg": f"Archivo '{filename}' y sus bloques eliminados"}
 
 
 @app.post("/mkdir")
-def make_dir(dirname: str = Body(..., embed=True), token: str = Depends(oauth2_scheme)):
+async def make_dir(dirname: str = Body(..., embed=True), token: str = Depends(oauth2_scheme)):
     username = verify_token(token)
-    print(f"[INFO] Creando directorio: {dirname} para usuario: {username}")
-
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO files (username, filename, metadata, block_location) VALUES (?, ?, ?, ?)", (username, dirname + "/", "{}", "{}"))
-    conn.commit()
+    logger.info("Creando directorio: %s para usuario: %s", dirname, username)
+
+    def insert_dir():
+        with get_conn() as conn:
+            cur = conn.cursor()
+            # Idempotente: si el directorio ya existe no se inserta otra fila
+            cur.execute("""
+                INSERT INTO files (username, filename, metadata, block_location)
+                SELECT :username, :filename, '{}', '{}'
+                WHERE NOT EXISTS (SELECT 1 FROM files WHERE username=:username AND filename=:filename)
+            """, {"username": username, "filename": dirname + "/"})
+            conn.commit()
+            return get_active_datanodes(cur)
 
     # Crear directorio en todos los DataNodes activos
-    cur.execute("SELECT host, port, last_heartbeat FROM datanodes")
-    all_nodes = cur.fetchall()
-    now = datetime.now()
-    active_nodes = [row for row in all_nodes if row[2] and (now - datetime.fromisoformat(row[2])).total_seconds() < 30]
-    results = []
-    for node in active_nodes:
-        host, port = node[0], node[1]
-        try:
-            with grpc.insecure_channel(f"{host}:{port}") as channel:
-                stub = dataNode_pb2_grpc.DataNodeServiceStub(channel)
-                request = dataNode_pb2.DirRequest(dir_name=dirname)
-                response = stub.MakeDir(request)
-                results.append({"datanode": f"{host}:{port}", "status": response.status})
-        except Exception as e:
-            results.append({"datanode": f"{host}:{port}", "status": f"Error: {e}"})
-    conn.close()
+    active_nodes = await asyncio.to_thread(insert_dir)
+    results = await call_datanodes(active_nodes, "MakeDir", dataNode_pb2.DirRequest(dir_name=dirname))
     return {"msg": f"Directorio '{dirname}' creado", "results": results}
 
 
 @app.delete("/rmdir/{dirname}")
-def remove_dir(dirname: str, token: str = Depends(oauth2_scheme)):
+async def remove_dir(dirname: str, token: str = Depends(oauth2_scheme)):
     username = verify_token(token)
-    print(f"[INFO] Eliminando directorio: {dirname} para usuario: {username}")
+    logger.info("Eliminando directorio: %s para usuario: %s", dirname, username)
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
     prefix = dirname.rstrip("/") + "/"
 
+    def active_datanodes():
+        with get_conn() as conn:
+            return get_active_datanodes(conn.cursor())
+
+    def delete_dir_entries():
+        with get_conn() as conn:
+            conn.execute("DELETE FROM files WHERE username=? AND filename LIKE ?", (username, prefix + "%"))
+            conn.commit()
+
     # Eliminar directorio en todos los DataNodes
-    cur.execute("SELECT host, port, last_heartbeat FROM datanodes")
-    all_nodes = cur.fetchall()
-    now = datetime.now()
-    active_nodes = [row for row in all_nodes if row[2] and (now - datetime.fromisoformat(row[2])).total_seconds() < 30]
-    results = []
-    for node in active_nodes:
-        host, port = node[0], node[1]
-        try:
-            with grpc.insecure_channel(f"{host}:{port}") as channel:
-                stub = dataNode_pb2_grpc.DataNodeServiceStub(channel)
-                from dataNode.protos import dataNode_pb2  # Importar aquí para evitar problemas de import
-                request = dataNode_pb2.DirRequest(dir_name=dirname)
-                response = stub.DeleteDir(request)
-                results.append({"datanode": f"{host}:{port}", "status": response.status})
-        except Exception as e:
-            results.append({"datanode": f"{host}:{port}", "status": f"Error: {e}"})
+    active_nodes = await asyncio.to_thread(active_datanodes)
+    results = await call_datanodes(active_nodes, "DeleteDir", dataNode_pb2.DirRequest(dir_name=dirname))
 
-    cur.execute("DELETE FROM files WHERE username=? AND filename LIKE ?", (username, prefix + "%"))
-    conn.commit()
-    conn.close()
+    await asyncio.to_thread(delete_dir_entries)
 
     # Resumir resultados por estado
     summary = {}